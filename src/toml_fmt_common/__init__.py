@@ -3,8 +3,11 @@
 from __future__ import annotations
 
 import difflib
+import errno
 import os
+import pickle  # noqa: S403 # only to check the workers can be sent the data
 import sys
+import weakref
 from abc import ABC, abstractmethod
 from argparse import (
     ArgumentDefaultsHelpFormatter,
@@ -12,23 +15,36 @@ from argparse import (
     ArgumentTypeError,
     Namespace,
     _ArgumentGroup,  # noqa: PLC2701
+    _VersionAction,  # noqa: PLC2701
 )
-from collections import deque
-from copy import deepcopy
-from dataclasses import dataclass
-from functools import partial
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout, suppress
+from copy import copy
+from dataclasses import dataclass, replace
+from functools import cache, partial
 from importlib.metadata import version
+from io import StringIO
 from pathlib import Path
+from stat import S_ISDIR, S_ISREG
 from typing import TYPE_CHECKING, Any, Generic, TypeVar
 
 if TYPE_CHECKING:
-    from collections.abc import Callable, Iterable, Mapping, Sequence
+    from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
 
 if sys.version_info >= (3, 11):  # pragma: >=3.11 cover
     import tomllib
 else:  # pragma: <3.11 cover
     import tomli as tomllib
 
+_SequenceMatcher: type[difflib.SequenceMatcher[str]]  # used for our own diffs only, difflib itself is left alone
+try:  # the C implementation of the sequence matcher is much faster on large diffs
+    from cdifflib import CSequenceMatcher  # type: ignore[import-not-found,import-untyped,unused-ignore]
+except ImportError:
+    _SequenceMatcher = difflib.SequenceMatcher
+else:  # pragma: no cover # only with the fast extra
+    _SequenceMatcher = CSequenceMatcher
+
 ArgumentGroup = _ArgumentGroup
 
 
@@ -100,6 +116,19 @@ class TOMLFormatter(ABC, Generic[T]):
         """
         raise NotImplementedError
 
+    def format_parsed(self, text: str, parsed: dict[str, Any], opt: T) -> str:  # noqa: ARG002
+        """
+        Run the formatter, with the TOML text already parsed.
+
+        Override this to reuse the parsed document instead of parsing the text again, by default calls :meth:`format`.
+
+        :param text: the TOML text to format
+        :param parsed: the parsed TOML text
+        :param opt: the flags to format with
+        :returns: the formatted TOML text
+        """
+        return self.format(text, opt)
+
 
 def run(info: TOMLFormatter[T], args: Sequence[str] | None = None) -> int:
     """
@@ -110,7 +139,11 @@ def run(info: TOMLFormatter[T], args: Sequence[str] | None = None) -> int:
     :return: exit code - 0 means already formatted correctly, otherwise 1
     """
     configs = _cli_args(info, sys.argv[1:] if args is None else args)
-    results = [_handle_one(info, config) for config in configs]
+    workers = _parallel_workers(info, configs)
+    if workers > 1:  # inputs are independent of each other, so format them in parallel
+        results = _handle_parallel(info, configs, workers)
+    else:
+        results = [_handle_one(info, config) for config in configs]
     return 1 if any(results) else 0  # exit with non success on change
 
 
@@ -120,9 +153,11 @@ class _Config(Generic[T]):
 
     toml_filename: Path | None  # path to the toml file or None if stdin
     toml: str  # the toml file content
+    parsed: dict[str, Any]  # the parsed toml file content
     stdout: bool  # push to standard out, implied if reading from stdin
     check: bool  # check only
     no_print_diff: bool  # don't print diff
+    cwd: Path  # working directory the run was started from, diff paths are shown relative to it
     opt: T
 
 
@@ -134,34 +169,40 @@ def _cli_args(info: TOMLFormatter[T], args: Sequence[str]) -> list[_Config[T]]:
     :param args: CLI arguments
     :return: the parsed options
     """
+    if tuple(args) in {("-V",), ("--version",)}:  # only the version asked for, answer without building the parser
+        print(f"{info.prog} ({_version(info.prog)})")  # noqa: T201
+        raise SystemExit(0)
     parser, type_conversion = _build_cli(info)
     parser.parse_args(namespace=info.opt, args=args)
     res = []
+    cwd = Path.cwd()
+    overridable = set(vars(info.opt)) - {"inputs", "stdout", "check", "no_print_diff"}
+    conversion_of = type_conversion.get
     for pyproject_toml in info.opt.inputs:
-        raw_pyproject_toml = sys.stdin.read() if pyproject_toml is None else pyproject_toml.read_text(encoding="utf-8")
-        config: dict[str, Any] | None = tomllib.loads(raw_pyproject_toml)
+        raw_pyproject_toml = sys.stdin.read() if pyproject_toml is None else _read_text(pyproject_toml)
+        parsed: dict[str, Any] = tomllib.loads(raw_pyproject_toml)
+        config: dict[str, Any] | None = parsed
 
-        parts = deque(info.override_cli_from_section)
-        while parts:  # pragma: no branch
-            part = parts.popleft()
-            if not isinstance(config, dict) or part not in config:
+        for part in info.override_cli_from_section:
+            if not isinstance(config, dict):
                 config = None
                 break
-            config = config[part]
-        override_opt = deepcopy(info.opt)
+            config = config.get(part)
+        override_opt = copy(info.opt)  # values are only replaced, never mutated, so shallow is enough
         if isinstance(config, dict):
-            for key in set(vars(override_opt).keys()) - {"inputs", "stdout", "check", "no_print_diff"}:
-                if key in config:
-                    raw = config[key]
-                    converted = type_conversion[key](raw) if key in type_conversion else raw
-                    setattr(override_opt, key, converted)
+            for key, raw in config.items():  # the section is usually much smaller than the option set
+                if key in overridable:
+                    conversion = conversion_of(key)
+                    setattr(override_opt, key, raw if conversion is None else conversion(raw))
         res.append(
             _Config(
                 toml_filename=pyproject_toml,
                 toml=raw_pyproject_toml,
+                parsed=parsed,
                 stdout=info.opt.stdout,
                 check=info.opt.check,
                 no_print_diff=info.opt.no_print_diff,
+                cwd=cwd,
                 opt=override_opt,
             )
         )
@@ -169,7 +210,75 @@ def _cli_args(info: TOMLFormatter[T], args: Sequence[str]) -> list[_Config[T]]:
     return res
 
 
+@cache
+def _version(prog: str) -> str:
+    """
+    Look up the installed version of the application.
+
+    :param prog: name of the application
+    :return: the version
+    """
+    return version(prog)
+
+
+class _LazyVersionAction(_VersionAction):
+    """Version action that only looks up the package version when triggered."""
+
+    def __call__(
+        self,
+        parser: ArgumentParser,
+        namespace: Namespace,
+        values: str | Sequence[Any] | None,
+        option_string: str | None = None,
+    ) -> None:
+        self.version = f"%(prog)s ({_version(parser.prog)})"
+        super().__call__(parser, namespace, values, option_string)
+
+
+def _read_text(path: Path) -> str:
+    """
+    Read a file as text, skipping both the buffered and text IO layer.
+
+    :param path: the file to read
+    :return: the decoded content, with newlines normalized as :meth:`pathlib.Path.read_text` would
+    """
+    with open(path, "rb", buffering=0) as file:  # noqa: PTH123 # unbuffered, reads the entire file in one go
+        return file.read().decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _write_text(path: Path, text: str) -> None:
+    """
+    Write text to a file, skipping the text IO layer.
+
+    :param path: the file to write
+    :param text: the content, newlines are translated as :meth:`pathlib.Path.write_text` would
+    """
+    if os.linesep != "\n":  # pragma: win32 cover
+        text = text.replace("\n", os.linesep)
+    path.write_bytes(text.encode("utf-8"))  # a single encode and write, no text wrapper
+
+
 def _build_cli(of: TOMLFormatter[T]) -> tuple[ArgumentParser, Mapping[str, Callable[[Any], Any]]]:
+    """
+    Get the parser for the formatter, building it only on first use.
+
+    :param of: the formatter
+    :return: the parser and the type conversions of the format flags
+    """
+    key = id(of)  # by identity, formatters need not be hashable
+    cli = _CLI_CACHE.get(key)
+    if cli is None:
+        cli = _create_cli(of)
+        with suppress(TypeError):  # not weak referable, just build it again next time
+            weakref.finalize(of, _CLI_CACHE.pop, key, None)  # drop it together with the formatter
+            _CLI_CACHE[key] = cli
+    return cli
+
+
+_CLI_CACHE: dict[int, tuple[ArgumentParser, Mapping[str, Callable[[Any], Any]]]] = {}
+
+
+def _create_cli(of: TOMLFormatter[T]) -> tuple[ArgumentParser, Mapping[str, Callable[[Any], Any]]]:
     parser = ArgumentParser(
         formatter_class=ArgumentDefaultsHelpFormatter,
         prog=of.prog,
@@ -177,9 +286,8 @@ def _build_cli(of: TOMLFormatter[T]) -> tuple[ArgumentParser, Mapping[str, Calla
     parser.add_argument(
         "-V",
         "--version",
-        action="version",
+        action=_LazyVersionAction,
         help="print package version of pyproject_fmt",
-        version=f"%(prog)s ({version(of.prog)})",
     )
 
     mode_group = parser.add_argument_group("run mode")
@@ -222,6 +330,9 @@ def _build_cli(of: TOMLFormatter[T]) -> tuple[ArgumentParser, Mapping[str, Calla
     return parser, type_conversion
 
 
+_MISSING_ERRNOS = {errno.ENOENT, errno.ENOTDIR, errno.EBADF, errno.ELOOP}  # those Path.exists() treats as missing
+
+
 def _toml_path_creator(filename: str, argument: str) -> Path | None:
     """
     Validate that toml can be formatted.
@@ -234,54 +345,316 @@ def _toml_path_creator(filename: str, argument: str) -> Path | None:
     if argument == "-":
         return None  # stdin, no further validation needed
     path = Path(argument).absolute()
-    if path.is_dir():
-        path /= filename
-    if not path.exists():
+    try:  # stat once and reuse the result, instead of a syscall per check
+        mode = path.stat().st_mode
+        if S_ISDIR(mode):
+            path /= filename
+            mode = path.stat().st_mode
+    except OSError as exc:
+        if exc.errno not in _MISSING_ERRNOS:
+            raise
         msg = "path does not exist"
-        raise ArgumentTypeError(msg)
-    if not path.is_file():
+        raise ArgumentTypeError(msg) from None
+    if not S_ISREG(mode):
         msg = "path is not a file"
         raise ArgumentTypeError(msg)
-    if not os.access(path, os.R_OK):
-        msg = "cannot read path"
-        raise ArgumentTypeError(msg)
-    if not os.access(path, os.W_OK):
-        msg = "cannot write path"
+    if not os.access(path, os.R_OK | os.W_OK):  # only tell the two apart on failure
+        msg = "cannot write path" if os.access(path, os.R_OK) else "cannot read path"
         raise ArgumentTypeError(msg)
     return path
 
 
+_PARALLEL_MIN_SIZE = 1 << 20  # below this much TOML text starting the worker processes costs more than it saves
+
+
+def _parallel_workers(info: TOMLFormatter[T], configs: list[_Config[T]]) -> int:
+    """
+    Decide how many worker processes to format with.
+
+    :param info: information specific to the current formatter
+    :param configs: the inputs to format
+    :return: number of workers, 1 means format in the current process
+    """
+    workers = min(len(configs), os.cpu_count() or 1)
+    if workers == 1 or any(config.toml_filename is None for config in configs):
+        return 1
+    if sum(len(config.toml) for config in configs) < _PARALLEL_MIN_SIZE:
+        return 1
+    try:  # the formatter and its options must be sent to the workers, the TOML derived values always pickle
+        pickle.dumps((info, configs[0].opt))
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return 1
+    return workers
+
+
+def _handle_parallel(info: TOMLFormatter[T], configs: list[_Config[T]], workers: int) -> list[bool]:
+    """
+    Format the inputs in a process pool.
+
+    :param info: information specific to the current formatter
+    :param configs: the inputs to format
+    :param workers: number of worker processes
+    :return: for each input if it was changed
+    """
+    if type(info).format_parsed is TOMLFormatter.format_parsed:  # parsed content is unused, don't send it over
+        configs = [replace(config, parsed={}) for config in configs]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for changed, output in executor.map(partial(_handle_one_captured, info), configs):
+            sys.stdout.write(output)  # print from the main process, in input order
+            results.append(changed)
+    return results
+
+
+def _handle_one_captured(info: TOMLFormatter[T], config: _Config[T]) -> tuple[bool, str]:  # pragma: no cover # worker
+    with redirect_stdout(StringIO()) as output:
+        changed = _handle_one(info, config)
+    return changed, output.getvalue()
+
+
 def _handle_one(info: TOMLFormatter[T], config: _Config[T]) -> bool:
-    formatted = info.format(config.toml, config.opt)
+    formatted = info.format_parsed(config.toml, config.parsed, config.opt)
     before = config.toml
-    changed = before != formatted
+    changed = before != formatted  # already O(1) when unchanged by identity or the length differs
     if config.toml_filename is None or config.stdout:  # when reading from stdin or writing to stdout, print new format
         print(formatted, end="")  # noqa: T201
         return changed
 
-    if before != formatted and not config.check:
-        config.toml_filename.write_text(formatted, encoding="utf-8")
-    if config.no_print_diff:
+    if changed and not config.check:
+        _write_text(config.toml_filename, formatted)
+    if config.no_print_diff:  # nothing left to do, skip the diff work
         return changed
     try:
-        name = str(config.toml_filename.relative_to(Path.cwd()))
+        name = str(config.toml_filename.relative_to(config.cwd))
     except ValueError:
         name = str(config.toml_filename)
-    diff: Iterable[str] = []
-    if changed:
-        diff = difflib.unified_diff(before.splitlines(), formatted.splitlines(), fromfile=name, tofile=name)
 
-    if diff:
-        diff = _color_diff(diff)
-        print("\n".join(diff))  # print diff on change  # noqa: T201
+    if changed:
+        before_lines, formatted_lines = _split_lines(before), _split_lines(formatted)
+        if os.environ.get("TOML_FMT_PATIENCE_DIFF"):  # opt-in while the patience diff is rolled out
+            diff = _unified_diff_fast(before_lines, formatted_lines, name)
+        else:
+            diff = _unified_diff(before_lines, formatted_lines, name)
+        _print_diff(diff)  # print diff on change
     else:
         print(f"no change for {name}")  # noqa: T201
     return changed
 
 
+def _split_lines(text: str) -> list[str]:
+    """
+    Split text into lines on newlines only.
+
+    Faster than :meth:`str.splitlines`, and does not break lines on the other separators it knows about (such as the
+    unicode line separator) that may appear inside TOML strings.
+
+    :param text: the text to split
+    :return: the lines, without a trailing empty one
+    """
+    lines = text.split("\n")
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def _unified_diff_fast(before: Sequence[str], after: Sequence[str], name: str) -> Iterator[str]:
+    """
+    Generate a unified diff using the patience algorithm.
+
+    :param before: lines before formatting
+    :param after: lines after formatting
+    :param name: the file name to show in the header
+    :return: the diff lines
+    """
+    return _unified_diff(before, after, name, _PatienceMatcher)
+
+
+def _unified_diff(
+    before: Sequence[str],
+    after: Sequence[str],
+    name: str,
+    matcher: type[difflib.SequenceMatcher[str]] = _SequenceMatcher,
+) -> Iterator[str]:
+    """
+    Generate a unified diff, in the same format as :func:`difflib.unified_diff`.
+
+    :param before: lines before formatting
+    :param after: lines after formatting
+    :param name: the file name to show in the header
+    :param matcher: the sequence matcher to find the differences with
+    :return: the diff lines
+    """
+    started = False
+    for group in matcher(None, before, after).get_grouped_opcodes(3):
+        if not started:
+            started = True
+            yield f"--- {name}\n"
+            yield f"+++ {name}\n"
+        first, last = group[0], group[-1]
+        yield f"@@ -{_format_range(first[1], last[2])} +{_format_range(first[3], last[4])} @@\n"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                yield from (f" {line}" for line in before[i1:i2])
+                continue
+            yield from (f"-{line}" for line in before[i1:i2])
+            yield from (f"+{line}" for line in after[j1:j2])
+
+
+def _format_range(start: int, stop: int) -> str:
+    length = stop - start
+    if length == 1:
+        return str(start + 1)
+    return f"{start + 1 if length else start},{length}"
+
+
+class _PatienceMatcher(difflib.SequenceMatcher[str]):
+    """Sequence matcher that anchors on the lines unique to both sides, as git's patience diff does."""
+
+    a: Sequence[str]
+    b: Sequence[str]
+    opcodes: list[tuple[str, int, int, int, int]] | None
+
+    def __init__(
+        self,
+        isjunk: Callable[[str], bool] | None = None,  # noqa: ARG002
+        a: Sequence[str] = (),
+        b: Sequence[str] = (),
+        autojunk: bool = True,  # noqa: ARG002, FBT001, FBT002
+    ) -> None:
+        # the base initializer builds an index of b that only its own matching uses, so skip it
+        self.a, self.b, self.opcodes = a, b, None
+
+    def get_matching_blocks(self) -> list[difflib.Match]:
+        """
+        Find the matching blocks, splitting the sequences around their unique common lines.
+
+        :returns: the matching blocks, terminated by a zero sized sentinel block
+        """
+        a, b = self.a, self.b
+        found: list[difflib.Match] = []
+        regions = [(0, len(a), 0, len(b))]
+        while regions:
+            a_lo, a_hi, b_lo, b_hi = regions.pop()
+            i, j = a_lo, b_lo  # strip the common prefix
+            while i < a_hi and j < b_hi and a[i] == b[j]:
+                i, j = i + 1, j + 1
+            if i > a_lo:
+                found.append(difflib.Match(a_lo, b_lo, i - a_lo))
+            a_lo, b_lo, i, j = i, j, a_hi, b_hi  # strip the common suffix
+            while i > a_lo and j > b_lo and a[i - 1] == b[j - 1]:
+                i, j = i - 1, j - 1
+            if i < a_hi:
+                found.append(difflib.Match(i, j, a_hi - i))
+            a_hi, b_hi = i, j
+            if a_lo == a_hi or b_lo == b_hi:
+                continue
+            anchors = self._unique_anchors(a_lo, a_hi, b_lo, b_hi)
+            if not anchors:  # no line is unique to both sides, let difflib find the matches
+                matcher = _SequenceMatcher(None, a[a_lo:a_hi], b[b_lo:b_hi])
+                found.extend(
+                    difflib.Match(a_lo + i, b_lo + j, size) for i, j, size in matcher.get_matching_blocks() if size
+                )
+                continue
+            for i, j in anchors:
+                found.append(difflib.Match(i, j, 1))
+                regions.append((a_lo, i, b_lo, j))
+                a_lo, b_lo = i + 1, j + 1
+            regions.append((a_lo, a_hi, b_lo, b_hi))
+        return [*_join_blocks(sorted(found)), difflib.Match(len(a), len(b), 0)]
+
+    def _unique_anchors(self, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> list[tuple[int, int]]:
+        """
+        Find the lines that occur exactly once on both sides, in an order both sides agree on.
+
+        :returns: the index pairs of the anchor lines
+        """
+        a, b = self.a, self.b
+        seen: dict[str, list[int]] = {}  # line to count in a, index in a, count in b, index in b
+        for i in range(a_lo, a_hi):
+            entry = seen.get(a[i])
+            if entry is None:
+                seen[a[i]] = [1, i, 0, 0]
+            else:
+                entry[0] += 1
+        for j in range(b_lo, b_hi):
+            entry = seen.get(b[j])
+            if entry is not None:
+                entry[2] += 1
+                entry[3] = j
+        # insertion order is the order of the first occurrence in a, so these are sorted by index in a
+        pairs = [(i, j) for count_a, i, count_b, j in seen.values() if count_a == 1 and count_b == 1]
+        return _longest_increasing(pairs)
+
+
+def _longest_increasing(pairs: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    Patience sort the index pairs.
+
+    :param pairs: index pairs, sorted by the first index
+    :returns: the longest subsequence of the pairs where the second index is increasing too
+    """
+    tails: list[int] = []  # smallest index in b that ends an increasing run of each length
+    tail_pair: list[int] = []
+    previous = [-1] * len(pairs)
+    for at, (_, j) in enumerate(pairs):
+        pos = bisect_left(tails, j)
+        if pos:
+            previous[at] = tail_pair[pos - 1]
+        if pos == len(tails):
+            tails.append(j)
+            tail_pair.append(at)
+        else:
+            tails[pos], tail_pair[pos] = j, at
+    anchors: list[tuple[int, int]] = []
+    at = tail_pair[-1] if tail_pair else -1
+    while at != -1:
+        anchors.append(pairs[at])
+        at = previous[at]
+    return anchors[::-1]
+
+
+def _join_blocks(blocks: Iterable[difflib.Match]) -> list[difflib.Match]:
+    """
+    Join adjacent matching blocks, as anchors get extended by the common prefix and suffix of their neighbors.
+
+    :param blocks: the matching blocks, sorted
+    :returns: the joined blocks
+    """
+    joined: list[difflib.Match] = []
+    for block in blocks:
+        last = joined[-1] if joined else None
+        if last is not None and last.a + last.size == block.a and last.b + last.size == block.b:
+            joined[-1] = difflib.Match(last.a, last.b, last.size + block.size)
+        else:
+            joined.append(block)
+    return joined
+
+
 GREEN = "\u001b[32m"
 RED = "\u001b[31m"
 RESET = "\u001b[0m"
+_LINE_COLOR = {"+": GREEN, "-": RED}  # diff line prefix to color
+GREEN_B = GREEN.encode("ascii")
+RED_B = RED.encode("ascii")
+RESET_B = RESET.encode("ascii")
+_LINE_COLOR_B = {b"+": GREEN_B, b"-": RED_B}
+
+
+def _print_diff(diff: Iterable[str]) -> None:
+    """
+    Print the colored diff, streamed line by line.
+
+    :param diff: the diff lines
+    """
+    stream = sys.stdout
+    buffer = getattr(stream, "buffer", None)
+    if buffer is None or os.linesep != "\n":  # in memory text stream, or the text layer must translate newlines
+        stream.writelines(_color_diff(diff))
+        return
+    stream.flush()  # anything already written must come first
+    encoding, errors = stream.encoding, stream.errors or "strict"
+    buffer.writelines(_color_diff_bytes(line.encode(encoding, errors) for line in diff))
+    buffer.flush()
 
 
 def _color_diff(diff: Iterable[str]) -> Iterable[str]:
@@ -289,14 +662,25 @@ def _color_diff(diff: Iterable[str]) -> Iterable[str]:
     Visualize difference with colors.
 
     :param diff: the diff lines
+    :return: the colored lines, each terminated by a newline
     """
+    color_of = _LINE_COLOR.get
     for line in diff:
-        if line.startswith("+"):
-            yield f"{GREEN}{line}{RESET}"
-        elif line.startswith("-"):
-            yield f"{RED}{line}{RESET}"
-        else:
-            yield line
+        color = color_of(line[:1])
+        yield f"{line}\n" if color is None else f"{color}{line}{RESET}\n"
+
+
+def _color_diff_bytes(diff: Iterable[bytes]) -> Iterable[bytes]:
+    """
+    Visualize difference with colors, operating on encoded lines.
+
+    :param diff: the encoded diff lines
+    :return: the colored lines, each terminated by a newline
+    """
+    color_of = _LINE_COLOR_B.get
+    for line in diff:
+        color = color_of(line[:1])
+        yield line + b"\n" if color is None else color + line + RESET_B + b"\n"
 
 
 __all__ = [
@@ -1,14 +1,34 @@
 from __future__ import annotations
 
+import difflib
+import errno
+import gc
 import os
-from io import StringIO
-from typing import TYPE_CHECKING
+import sys
+from dataclasses import dataclass
+from io import BytesIO, StringIO, TextIOWrapper
+from time import perf_counter
+from typing import TYPE_CHECKING, Any
 
 import pytest
 
-from toml_fmt_common import GREEN, RED, RESET, ArgumentGroup, FmtNamespace, TOMLFormatter, run
+import toml_fmt_common
+from toml_fmt_common import (
+    _CLI_CACHE,
+    GREEN,
+    RED,
+    RESET,
+    ArgumentGroup,
+    FmtNamespace,
+    TOMLFormatter,
+    _PatienceMatcher,
+    _unified_diff,
+    _unified_diff_fast,
+    run,
+)
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
     from pathlib import Path
 
     from pytest_mock import MockerFixture
@@ -49,6 +69,11 @@ class Dumb(TOMLFormatter[DumpNamespace]):
         ])
 
 
+class DumbParsed(Dumb):
+    def format_parsed(self, text: str, parsed: dict[str, Any], opt: DumpNamespace) -> str:
+        return "\n".join([self.format(text, opt), f"keys = {','.join(parsed)!r}"])
+
+
 def test_dumb_help(capsys: pytest.CaptureFixture[str]) -> None:
     with pytest.raises(SystemExit) as exc:
         run(Dumb(), ["--help"])
@@ -60,6 +85,85 @@ def test_dumb_help(capsys: pytest.CaptureFixture[str]) -> None:
     assert "this is something extra" in out
 
 
+@pytest.mark.parametrize("args", [["-V"], ["--version"], ["E", "-V"], ["E", "--version"], ["E", "-nV"]])
+def test_dumb_version(capsys: pytest.CaptureFixture[str], args: list[str]) -> None:
+    with pytest.raises(SystemExit) as exc:
+        run(Dumb(), args)
+
+    assert exc.value.code == 0
+
+    out, err = capsys.readouterr()
+    assert not err
+    assert out.startswith("toml-fmt-common (")
+
+
+def test_dumb_parser_reused(tmp_path: Path, mocker: MockerFixture) -> None:
+    dumb = tmp_path / "dumb.toml"
+    dumb.write_text("a = 1")
+    formatter = Dumb()
+    create_cli = mocker.spy(toml_fmt_common, "_create_cli")
+
+    run(formatter, ["E", str(dumb), "--check", "--no-print-diff"])
+    run(formatter, ["E", str(dumb), "--check", "--no-print-diff"])
+
+    create_cli.assert_called_once_with(formatter)
+
+
+def test_dumb_parser_released_with_formatter(tmp_path: Path) -> None:
+    dumb = tmp_path / "dumb.toml"
+    dumb.write_text("a = 1")
+    formatter = Dumb()
+    run(formatter, ["E", str(dumb), "--check", "--no-print-diff"])
+    key = id(formatter)
+    assert key in _CLI_CACHE
+
+    del formatter
+    gc.collect()
+
+    assert key not in _CLI_CACHE
+
+
+@dataclass(eq=True)
+class DumbUnhashable(Dumb):
+    def __post_init__(self) -> None:
+        super().__init__()
+
+
+class DumbSlots(Dumb):
+    __slots__ = ()
+
+
+@pytest.mark.parametrize("formatter_class", [DumbUnhashable, DumbSlots])
+def test_dumb_format_unusual_formatter(tmp_path: Path, formatter_class: type[Dumb]) -> None:
+    dumb = tmp_path / "dumb.toml"
+    dumb.write_text("a = 1")
+
+    for _ in range(2):
+        assert run(formatter_class(), ["E", str(dumb), "--check", "--no-print-diff"]) == 1
+
+
+def test_dumb_version_with_invalid_input(capsys: pytest.CaptureFixture[str], tmp_path: Path) -> None:
+    with pytest.raises(SystemExit) as exc:
+        run(Dumb(), ["E", str(tmp_path / "missing.toml"), "-V"])
+
+    assert exc.value.code == 2
+
+    out, err = capsys.readouterr()
+    assert "\ntoml-fmt-common: error: argument inputs: path does not exist\n" in err
+    assert not out
+
+
+def test_dumb_version_after_end_of_options(capsys: pytest.CaptureFixture[str], tmp_path: Path) -> None:
+    with pytest.raises(SystemExit) as exc:
+        run(Dumb(), ["E", "--", str(tmp_path / "-V")])
+
+    assert exc.value.code == 2
+
+    out, err = capsys.readouterr()
+    assert "\ntoml-fmt-common: error: argument inputs: path does not exist\n" in err
+    assert not out
+
+
 def test_dumb_format_with_override(capsys: pytest.CaptureFixture[str], tmp_path: Path) -> None:
     dumb = tmp_path / "dumb.toml"
     dumb.write_text("[start.sub]\nextra = 'B'")
@@ -84,6 +188,42 @@ def test_dumb_format_with_override(capsys: pytest.CaptureFixture[str], tmp_path:
     ]
 
 
+def test_dumb_format_text_only_stdout(tmp_path: Path, mocker: MockerFixture) -> None:
+    stdout = mocker.patch("sys.stdout", StringIO())
+    dumb = tmp_path / "dumb.toml"
+    dumb.write_text("[start.sub]\nextra = 'B'")
+
+    exit_code = run(Dumb(), ["E", str(dumb)])
+    assert exit_code == 1
+
+    assert stdout.getvalue().splitlines() == [
+        f"{RED}--- {dumb}",
+        f"{RESET}",
+        f"{GREEN}+++ {dumb}",
+        f"{RESET}",
+        "@@ -1,2 +1,3 @@",
+        "",
+        " [start.sub]",
+        " extra = 'B'",
+        f"{GREEN}+extras = 'B'{RESET}",
+    ]
+
+
+def test_dumb_format_windows_newlines(tmp_path: Path, mocker: MockerFixture) -> None:
+    mocker.patch("os.linesep", "\r\n")
+    raw = BytesIO()
+    mocker.patch("sys.stdout", TextIOWrapper(raw, encoding="utf-8", newline="\r\n"))
+    dumb = tmp_path / "dumb.toml"
+    dumb.write_text("start = 'B'")
+
+    exit_code = run(Dumb(), ["E", str(dumb), "--check"])
+    assert exit_code == 1
+
+    sys.stdout.flush()
+    assert raw.getvalue().endswith(f" start = 'B'\r\n{GREEN}+extras = 'E'{RESET}\r\n".encode())
+    assert b"\n" not in raw.getvalue().replace(b"\r\n", b"")
+
+
 def test_dumb_format_with_override_custom_type(capsys: pytest.CaptureFixture[str], tmp_path: Path) -> None:
     dumb = tmp_path / "dumb.toml"
     dumb.write_text("[start.sub]\ntuple_magic = '1.2.3'")
@@ -109,6 +249,140 @@ def test_dumb_format_with_override_custom_type(capsys: pytest.CaptureFixture[str
     ]
 
 
+def test_dumb_format_override_ignores_run_mode_and_unknown(capsys: pytest.CaptureFixture[str], tmp_path: Path) -> None:
+    dumb = tmp_path / "dumb.toml"
+    dumb.write_text("[start.sub]\ncheck = true\nunknown = 1")
+
+    exit_code = run(Dumb(), ["E", str(dumb), "--no-print-diff"])
+    assert exit_code == 1
+
+    assert dumb.read_text() == "[start.sub]\ncheck = true\nunknown = 1\nextras = 'E'"
+
+    out, err = capsys.readouterr()
+    assert not err
+    assert not out
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        pytest.param("[start.sub]\nextra = 'B'", id="simple"),
+        pytest.param("", id="empty"),
+        pytest.param("start = 'B'", id="single-line"),
+        pytest.param("a = 1\n" + "#\n" * 70 + "b = 2\n" + "#\n" * 70, id="common-lines"),
+        pytest.param("#\n" * 70, id="only-common-lines"),
+    ],
+)
+def test_dumb_format_patience_diff_same_as_difflib(
+    capsys: pytest.CaptureFixture[str], tmp_path: Path, monkeypatch: pytest.MonkeyPatch, content: str
+) -> None:
+    dumb = tmp_path / "dumb.toml"
+    dumb.write_text(content)
+
+    assert run(Dumb(), ["E", str(dumb), "--check"]) == 1
+    expected = capsys.readouterr()
+    monkeypatch.setenv("TOML_FMT_PATIENCE_DIFF", "1")
+    assert run(Dumb(), ["E", str(dumb), "--check"]) == 1
+
+    assert capsys.readouterr() == expected
+
+
+@pytest.mark.parametrize(
+    ("before", "after"),
+    [
+        pytest.param(["a", "b"], ["a", "b"], id="same"),
+        pytest.param([str(i) for i in range(20)], ["x", *(str(i) for i in range(1, 19)), "y"], id="multiple-hunks"),
+        pytest.param(["r", "c", "c", "d"], ["r", "x", "c", "d"], id="repeated-lines"),
+        pytest.param(["c", "u", "c"], ["c"], id="equally-rare-lines"),
+    ],
+)
+def test_unified_diff_same_as_difflib(before: list[str], after: list[str]) -> None:
+    expected = list(difflib.unified_diff(before, after, fromfile="n", tofile="n"))
+    assert list(_unified_diff(before, after, "n")) == expected
+    assert list(_unified_diff_fast(before, after, "n")) == expected
+
+
+@pytest.mark.parametrize(
+    ("before", "after"),
+    [
+        pytest.param(["x", "d", "d", "y"], ["x", "q", "d", "y"], id="duplicate-lines"),
+        pytest.param(["p", "q", "r", "s"], ["r", "s", "q", "p"], id="moved-lines"),
+        pytest.param(["a", "b", "c", "a", "b", "c"], ["c", "a", "x", "b", "c"], id="repeated-lines"),
+    ],
+)
+def test_patience_matcher_opcodes_rebuild_after(before: list[str], after: list[str]) -> None:
+    rebuilt: list[str] = []
+    for tag, i1, i2, j1, j2 in _PatienceMatcher(None, before, after).get_opcodes():
+        if tag == "equal":
+            assert before[i1:i2] == after[j1:j2]
+        rebuilt.extend(after[j1:j2])
+
+    assert rebuilt == after
+
+
+def test_unified_diff_fast_on_repeated_lines() -> None:
+    before = ["x = 1"] * 3000
+    after = [*before[:1500], "y = 2", *before[1501:]]
+
+    # difflib treats the very common line as junk and replaces the whole file
+    assert len(list(difflib.unified_diff(before, after, fromfile="n", tofile="n"))) == 3006
+    assert list(_unified_diff_fast(before, after, "n")) == [
+        "--- n\n",
+        "+++ n\n",
+        "@@ -1498,7 +1498,7 @@\n",
+        *[" x = 1"] * 3,
+        "-x = 1",
+        "+y = 2",
+        *[" x = 1"] * 3,
+    ]
+
+
+def test_unified_diff_fast_faster_than_difflib() -> None:
+    before = [f"k{i} = {i}" for i in range(2000)]
+    after = [f"{line}!" if i % 3 == 0 else line for i, line in enumerate(before)]
+
+    start = perf_counter()
+    fast = list(_unified_diff_fast(before, after, "n"))
+    fast_time = perf_counter() - start
+    start = perf_counter()
+    expected = list(difflib.unified_diff(before, after, fromfile="n", tofile="n"))
+    difflib_time = perf_counter() - start
+
+    assert fast == expected
+    assert fast_time < difflib_time
+
+
+def test_dumb_format_parsed(tmp_path: Path) -> None:
+    dumb = tmp_path / "dumb.toml"
+    dumb.write_text("a = 1\n[start.sub]\nextra = 'B'")
+
+    exit_code = run(DumbParsed(), ["E", str(dumb), "--no-print-diff"])
+    assert exit_code == 1
+
+    assert dumb.read_text() == "a = 1\n[start.sub]\nextra = 'B'\nextras = 'B'\nkeys = 'a,start'"
+
+
+def test_dumb_format_twice_same_path(tmp_path: Path) -> None:
+    dumb = tmp_path / "dumb.toml"
+    for _ in range(2):
+        dumb.write_text("a = 1")
+
+        exit_code = run(Dumb(), ["E", str(dumb), "--no-print-diff"])
+        assert exit_code == 1
+
+        assert dumb.read_text() == "a = 1\nextras = 'E'"
+
+
+def test_dumb_format_datetime(tmp_path: Path) -> None:
+    dumb = tmp_path / "dumb.toml"
+    dumb.write_text("c = 1979-05-27T07:32:00")
+
+    exit_code = run(Dumb(), ["E", str(dumb), "--no-print-diff"])
+    assert exit_code == 1
+
+    assert dumb.read_text() == "c = 1979-05-27T07:32:00\nextras = 'E'"
+
+
 def test_dumb_format_no_print_diff(capsys: pytest.CaptureFixture[str], tmp_path: Path) -> None:
     dumb = tmp_path / "dumb.toml"
     dumb.write_text("[start.sub]\nextra = 'B'")
@@ -140,6 +414,32 @@ def test_dumb_format_already_good(
     assert out.splitlines() == [f"no change for {dumb}"]
 
 
+def test_dumb_format_crlf_already_good(
+    capsys: pytest.CaptureFixture[str], tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("NO_FMT", "1")
+    dumb = tmp_path / "dumb.toml"
+    dumb.write_bytes(b"[start.sub]\r\nextra = 'B'\r\n")
+
+    exit_code = run(Dumb(), ["E", str(dumb)])
+    assert exit_code == 0
+
+    assert dumb.read_bytes() == b"[start.sub]\r\nextra = 'B'\r\n"
+
+    out, err = capsys.readouterr()
+    assert not err
+    assert out.splitlines() == [f"no change for {dumb}"]
+
+
+def test_dumb_format_lone_cr(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("NO_FMT", "1")
+    dumb = tmp_path / "dumb.toml"
+    dumb.write_bytes(b"a = 1\rb = 2")
+
+    exit_code = run(Dumb(), ["E", str(dumb), "--no-print-diff"])
+    assert exit_code == 0
+
+
 def test_dumb_format_via_folder(
     capsys: pytest.CaptureFixture[str], tmp_path: Path, monkeypatch: pytest.MonkeyPatch
 ) -> None:
@@ -213,6 +513,125 @@ def test_dumb_format_override_non_dict_part(capsys: pytest.CaptureFixture[str],
     ]
 
 
+@pytest.mark.parametrize("parallel", [True, False])
+def test_dumb_format_multiple(
+    capsys: pytest.CaptureFixture[str], tmp_path: Path, mocker: MockerFixture, parallel: bool
+) -> None:
+    mocker.patch("os.cpu_count", return_value=2)
+    if parallel:
+        mocker.patch("toml_fmt_common._PARALLEL_MIN_SIZE", 0)
+    first, second = tmp_path / "a", tmp_path / "b"
+    for folder, content in ((first, "a = 1"), (second, "b = 2")):
+        folder.mkdir()
+        (folder / "dumb.toml").write_text(content)
+
+    exit_code = run(Dumb(), ["E", str(first), str(second), "--check"])
+    assert exit_code == 1
+
+    assert (first / "dumb.toml").read_text() == "a = 1"
+    assert (second / "dumb.toml").read_text() == "b = 2"
+
+    out, err = capsys.readouterr()
+    assert not err
+    assert out.splitlines() == [
+        f"{RED}--- {first / 'dumb.toml'}",
+        f"{RESET}",
+        f"{GREEN}+++ {first / 'dumb.toml'}",
+        f"{RESET}",
+        "@@ -1 +1,2 @@",
+        "",
+        " a = 1",
+        f"{GREEN}+extras = 'E'{RESET}",
+        f"{RED}--- {second / 'dumb.toml'}",
+        f"{RESET}",
+        f"{GREEN}+++ {second / 'dumb.toml'}",
+        f"{RESET}",
+        "@@ -1 +1,2 @@",
+        "",
+        " b = 2",
+        f"{GREEN}+extras = 'E'{RESET}",
+    ]
+
+
+@pytest.mark.parametrize(("formatter", "parsed"), [(Dumb(), {}), (DumbParsed(), {"a": 1})])
+def test_dumb_format_parallel_sends_parsed_only_if_used(
+    tmp_path: Path, mocker: MockerFixture, formatter: Dumb, parsed: dict[str, Any]
+) -> None:
+    mocker.patch("os.cpu_count", return_value=2)
+    mocker.patch("toml_fmt_common._PARALLEL_MIN_SIZE", 0)
+    pool = mocker.patch("toml_fmt_common.ProcessPoolExecutor")
+    sent: list[Any] = []
+
+    def run_inline(func: Callable[[Any], Any], configs: Iterable[Any]) -> Iterator[Any]:
+        sent.extend(configs)
+        return map(func, sent)
+
+    pool.return_value.__enter__.return_value.map.side_effect = run_inline
+    first, second = tmp_path / "a.toml", tmp_path / "b.toml"
+    first.write_text("a = 1")
+    second.write_text("a = 1")
+
+    exit_code = run(formatter, ["E", str(first), str(second), "--check", "--no-print-diff"])
+    assert exit_code == 1
+
+    assert [config.parsed for config in sent] == [parsed, parsed]
+
+
+class DumbUnpicklable(Dumb):
+    def __init__(self) -> None:
+        super().__init__()
+        self.hook = lambda: None
+
+
+def test_dumb_format_multiple_unpicklable_serial(tmp_path: Path, mocker: MockerFixture) -> None:
+    mocker.patch("os.cpu_count", return_value=2)
+    mocker.patch("toml_fmt_common._PARALLEL_MIN_SIZE", 0)
+    pool = mocker.patch("toml_fmt_common.ProcessPoolExecutor")
+    first, second = tmp_path / "a.toml", tmp_path / "b.toml"
+    first.write_text("a = 1")
+    second.write_text("b = 2")
+
+    exit_code = run(DumbUnpicklable(), ["E", str(first), str(second), "--no-print-diff"])
+    assert exit_code == 1
+
+    assert first.read_text() == "a = 1\nextras = 'E'"
+    assert second.read_text() == "b = 2\nextras = 'E'"
+    pool.assert_not_called()
+
+
+def test_dumb_format_multiple_with_stdin_serial(
+    capsys: pytest.CaptureFixture[str], tmp_path: Path, mocker: MockerFixture
+) -> None:
+    mocker.patch("os.cpu_count", return_value=2)
+    mocker.patch("toml_fmt_common._PARALLEL_MIN_SIZE", 0)
+    mocker.patch("sys.stdin", StringIO("ok = 1"))
+    pool = mocker.patch("toml_fmt_common.ProcessPoolExecutor")
+    dumb = tmp_path / "dumb.toml"
+    dumb.write_text("a = 1")
+
+    exit_code = run(Dumb(), ["E", "-", str(dumb), "--no-print-diff"])
+    assert exit_code == 1
+
+    out, err = capsys.readouterr()
+    assert not err
+    assert out == "ok = 1\nextras = 'E'"
+    pool.assert_not_called()
+
+
+def test_dumb_format_many_stdout(capsys: pytest.CaptureFixture[str], tmp_path: Path) -> None:
+    folders = [tmp_path / str(i) for i in range(5)]
+    for i, folder in enumerate(folders):
+        folder.mkdir()
+        (folder / "dumb.toml").write_text(f"v = {i}\n")
+
+    exit_code = run(Dumb(), ["E", *(str(i) for i in folders), "--stdout"])
+    assert exit_code == 1
+
+    out, err = capsys.readouterr()
+    assert not err
+    assert out == "".join(f"v = {i}\n\nextras = 'E'" for i in range(5))
+
+
 def test_dumb_stdin(capsys: pytest.CaptureFixture[str], mocker: MockerFixture) -> None:
     mocker.patch("sys.stdin", StringIO("ok = 1"))
 
@@ -235,6 +654,29 @@ def test_dumb_path_missing(capsys: pytest.CaptureFixture[str], tmp_path: Path, m
     assert not out
 
 
+def test_dumb_path_symlink_loop(capsys: pytest.CaptureFixture[str], tmp_path: Path) -> None:
+    toml = tmp_path / "dumb.toml"
+    toml.symlink_to(tmp_path / "other.toml")
+    (tmp_path / "other.toml").symlink_to(toml)
+
+    with pytest.raises(SystemExit) as exc:
+        run(Dumb(), ["E", str(toml)])
+
+    assert exc.value.code == 2
+    out, err = capsys.readouterr()
+    assert "\ntoml-fmt-common: error: argument inputs: path does not exist\n" in err
+    assert not out
+
+
+def test_dumb_path_stat_error(tmp_path: Path, mocker: MockerFixture) -> None:
+    toml = tmp_path / "dumb.toml"
+    toml.write_text("")
+    mocker.patch("pathlib.Path.stat", side_effect=PermissionError(errno.EACCES, "denied"))
+
+    with pytest.raises(PermissionError):
+        run(Dumb(), ["E", str(toml)])
+
+
 def test_dumb_path_is_folder(capsys: pytest.CaptureFixture[str], tmp_path: Path) -> None:
     toml = tmp_path / "dumb.toml"
     os.mkfifo(toml)